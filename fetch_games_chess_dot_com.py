@@ -3,13 +3,26 @@ import chess
 import chess.pgn
 import chess.engine
 import io
-import requests
-# --- ADD THIS IMPORT at the top of your script ---
-from collections import defaultdict
+import asyncio
+import aiohttp
+import numpy as np
+try:
+    from numba import njit
+except ImportError: # Numba is optional; without it _tally just runs as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 import json
 import hashlib # Add this import
+import os
+import multiprocessing
+import multiprocessing.util
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 # --- DB CONFIGURATION ---
 DB_NAME = "chess_analysis"
@@ -35,12 +48,17 @@ def get_db_connection():
 USERNAME = 'hunterisbad1' 
 NUM_GAMES = 1
 STOCKFISH_PATH = '/usr/games/stockfish' 
-ANALYSIS_DEPTH = 18 
+ANALYSIS_NODES = 1_000_000 # Search budget per position; a fixed node count keeps time per move predictable
+MULTIPV = 2 # Lines per search; the user's move is usually one of them
+SKIP_OPENING_PLIES = 4 # Opening plies (both sides) left out of the analysis
+NUM_WORKERS = max(1, (os.cpu_count() or 2) // 2) # One Stockfish process per worker
+ENGINE_HASH_MB = 128 # Transposition table size per worker engine
+SAVE_BATCH_SIZE = 25 # Commit analyzed games in batches so a crash loses at most this many
+FETCH_WORKERS = 6 # Concurrent archive downloads; keep this low to respect Chess.com rate limits
 # ---------------------
 
-def fetch_chessdotcom_games(username, max_games):
-    """Fetches games from Chess.com API, streaming PGN data."""
-    all_pgn_data = []
+async def fetch_chessdotcom_games(username, max_games):
+    """Fetches games from Chess.com API, yielding each PGN as soon as its archive arrives."""
     
     # 1. DEFINE HEADERS TO AVOID 403 ERROR
     headers = {
@@ -48,89 +66,175 @@ def fetch_chessdotcom_games(username, max_games):
         'User-Agent': 'ChessCoachProject (YourAppName/1.0; contact@example.com)' 
     }
     
-    # 2. Get list of archive URLs
-    archive_url = f"https://api.chess.com/pub/player/{username}/games/archives"
-    print(f"Checking Chess.com archives for {username}...")
+    # One session for every request: keeps connections to the API open and caps how many run at once
+    connector = aiohttp.TCPConnector(limit=FETCH_WORKERS)
+    async with aiohttp.ClientSession(headers=headers, connector=connector) as session:
+        
+        # 2. Get list of archive URLs
+        archive_url = f"https://api.chess.com/pub/player/{username}/games/archives"
+        print(f"Checking Chess.com archives for {username}...")
+        
+        try:
+            async with session.get(archive_url) as response:
+                response.raise_for_status()
+                archives = (await response.json()).get('archives', [])
+        except aiohttp.ClientResponseError as e:
+            # Check if the error is due to a 404 (user not found) or 403 (access denied)
+            if e.status == 404:
+                 print("Error: Username not found (404). Please check spelling.")
+            elif e.status == 403:
+                 print("Error: Access Forbidden (403). Try adding a User-Agent header.")
+            else:
+                 print(f"Error fetching archives: {e}")
+            return
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            print(f"Error fetching archives: {str(e) or type(e).__name__}")
+            return
+        
+        async def fetch_archive(url):
+            """Fetches all games from one monthly archive URL."""
+            print(f"Fetching games from {url}...")
+            try:
+                async with session.get(url) as archive_response:
+                    archive_response.raise_for_status()
+                    return (await archive_response.json()).get('games', [])
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                # Skip a month that fails, times out, or returns a malformed body; keep the rest
+                print(f"Error fetching archive {url}: {str(e) or type(e).__name__}")
+                return []
+        
+        # 3. Process archives from most recent (end of list) backwards. The newest
+        # month often has enough games on its own, so it is fetched first; the older
+        # months are only fetched (up to FETCH_WORKERS ahead) if we still need more games.
+        archives = archives[::-1]
+        pending = deque()
+        next_archive = 0
+        found = 0
+        
+        try:
+            while pending or next_archive < len(archives):
+                window = 1 if next_archive == 0 else FETCH_WORKERS
+                while next_archive < len(archives) and len(pending) < window:
+                    pending.append(asyncio.create_task(fetch_archive(archives[next_archive])))
+                    next_archive += 1
+                
+                games_json = await pending.popleft()
+                # Walk the month's games newest-first and stop as soon as we have enough
+                for game_data in reversed(games_json):
+                    pgn_text = game_data.get('pgn')
+                    if pgn_text:
+                        yield pgn_text
+                        found += 1
+                        if found >= max_games:
+                            return
+        finally:
+            # Don't keep downloading archives we no longer need
+            for task in pending:
+                task.cancel()
+
+def _produce_games(pgn_queue, username, max_games):
+    """Runs the async Chess.com fetch in its own event loop, putting each PGN on pgn_queue as it arrives."""
+    
+    async def produce():
+        async for pgn_text in fetch_chessdotcom_games(username, max_games):
+            pgn_queue.put(pgn_text)
     
     try:
-        # PASS HEADERS HERE
-        response = requests.get(archive_url, headers=headers)
-        response.raise_for_status() 
-        archives = response.json().get('archives', [])
-    except requests.exceptions.RequestException as e:
-        # Check if the error is due to a 404 (user not found) or 403 (access denied)
-        if response.status_code == 404:
-             print("Error: Username not found (404). Please check spelling.")
-        elif response.status_code == 403:
-             print("Error: Access Forbidden (403). Try adding a User-Agent header.")
-        else:
-             print(f"Error fetching archives: {e}")
-        return []
+        asyncio.run(produce())
+    finally:
+        pgn_queue.put(None) # Tells the consumer that fetching is done
 
-    # Process archives from most recent (end of list) backwards
-    for url in reversed(archives):
-        print(f"Fetching games from {url}...")
+def _drain_batches(pgn_queue):
+    """Yields lists of PGNs from pgn_queue: each batch is everything that arrived since the last one."""
+    while True:
+        batch = [pgn_queue.get()] # Block until at least one PGN (or the end marker) arrives
+        while True:
+            try:
+                batch.append(pgn_queue.get_nowait())
+            except queue.Empty:
+                break
         
-        try:
-            # 3. Fetch all games from the monthly archive URL
-            # PASS HEADERS HERE AGAIN
-            archive_response = requests.get(url, headers=headers)
-            archive_response.raise_for_status()
-            
-            games_json = archive_response.json().get('games', [])
-            
-            for game_data in reversed(games_json):
-                pgn_text = game_data.get('pgn')
-                
-                if pgn_text and len(all_pgn_data) < max_games:
-                    all_pgn_data.append(pgn_text)
-                    
-                if len(all_pgn_data) >= max_games:
-                    return all_pgn_data
-            
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching archive {url}: {e}")
-            continue
-
-    return all_pgn_data
-
-def get_mistake_category(cpl):
-    """Categorizes the CPL into human-readable terms."""
-    if cpl > 300:
-        return "Blunder"
-    elif cpl > 100:
-        return "Mistake"
-    elif cpl > 50:
-        return "Inaccuracy"
-    else:
-        return "Good Move"
-
-def get_game_phase(move_num):
-    """Determines the phase of the game based on the move number."""
-    if move_num <= 10:
-        return "Opening"
-    elif move_num <= 30:
-        return "Middlegame"
-    else:
-        return "Endgame"
+        done = batch[-1] is None
+        if done:
+            batch.pop()
+        if batch:
+            yield batch
+        if done:
+            return
+
+# Bucket edges: values up to and including each threshold fall in that bucket.
+_CPL_THRESHOLDS = (50, 100, 300)
+_CPL_NAMES = ("Good Move", "Inaccuracy", "Mistake", "Blunder") # Mistake categories by CPL bucket
+_PHASE_CUTOFFS = (10, 30) # Move numbers that end the Opening and the Middlegame
+PHASES = ("Opening", "Middlegame", "Endgame")
+
+@njit(cache=True)
+def _tally(cpls, move_nums):
+    """
+    Classifies and sums every user move of a game in one compiled loop.
+    Returns (phase_cpl[3], phase_cnt[3], mistake_counts[3, 4]), indexed like PHASES x _CPL_NAMES.
+    """
+    phase_cpl = np.zeros(3, dtype=np.int64)
+    phase_cnt = np.zeros(3, dtype=np.int64)
+    mistake_counts = np.zeros((3, 4), dtype=np.int64)
+    
+    for i in range(cpls.shape[0]):
+        cpl = cpls[i]
+        move_num = move_nums[i]
+        phase = 0 if move_num <= _PHASE_CUTOFFS[0] else (1 if move_num <= _PHASE_CUTOFFS[1] else 2)
+        # Each threshold the CPL is above moves it up one category
+        category = 0
+        for threshold in _CPL_THRESHOLDS:
+            category += cpl > threshold
+        
+        phase_cpl[phase] += cpl
+        phase_cnt[phase] += 1
+        mistake_counts[phase, category] += 1
+    
+    return phase_cpl, phase_cnt, mistake_counts
+
+def mistakes_by_phase(mistake_counts):
+    """Turns a phase x category count matrix into {"Phase - Category": count}, leaving out good moves."""
+    return {
+        f"{PHASES[phase]} - {_CPL_NAMES[category]}": int(mistake_counts[phase, category])
+        for phase in range(len(PHASES))
+        for category in range(1, len(_CPL_NAMES))
+        if mistake_counts[phase, category]
+    }
     
-# --- (Keep get_centipawn_loss function here - It is unchanged) ---
-def get_centipawn_loss(engine, board, move):
+# Built once and shared by every search. Only request the info fields we read,
+# so python-chess skips parsing the rest of each UCI info line.
+_LIMIT = chess.engine.Limit(nodes=ANALYSIS_NODES)
+_INFO = chess.engine.INFO_SCORE
+_INFO_MULTIPV = chess.engine.INFO_SCORE | chess.engine.INFO_PV # PV is needed to match the user's move
+
+def evaluate_position(engine, board):
+    """Returns the engine's evaluation of the board in centipawns, relative to the side to move."""
+    info = engine.analyse(board, _LIMIT, info=_INFO)
+    return score_to_cp(info['score'].relative, mate_value=10000)
+
+def analyze_move_inplace(engine, board, move):
     """
     Calculates the CPL for a given move using the best practice of
     comparing the value of the engine's best move to the actual move.
+    The move is played on the board (and left there), so the caller must not push it again.
     """
     
-    # 1. Evaluate the position *before* the move to find the BEST possible score
-    # We use a deeper search here to ensure we find the true best move evaluation
-    info_best = engine.analyse(board, chess.engine.Limit(depth=18)) # Use your set ANALYSIS_DEPTH
-    score_best = score_to_cp(info_best['score'].relative, mate_value=10000)
+    # 1. One MultiPV search of the position *before* the move gives the BEST
+    # score and, usually, the score of the user's move from the same tree.
+    info_list = engine.analyse(board, _LIMIT, multipv=MULTIPV, info=_INFO_MULTIPV)
+    score_best = score_to_cp(info_list[0]['score'].relative, mate_value=10000)
     
-    # 2. Evaluate the position *after* the user's actual move
-    board.push(move)
-    info_actual = engine.analyse(board, chess.engine.Limit(depth=18))
-    score_actual = score_to_cp(info_actual['score'].relative, mate_value=10000)
-    board.pop()
+    for info in info_list:
+        if info.get('pv') and info['pv'][0] == move:
+            score_actual = score_to_cp(info['score'].relative, mate_value=10000)
+            board.push(move)
+            break
+    else:
+        # 2. The user's move isn't among the top lines: evaluate the position
+        # *after* it. That score is relative to the opponent, so negate it.
+        board.push(move)
+        score_actual = -evaluate_position(engine, board)
     
     # CPL is the difference between the best possible evaluation and the evaluation after the move.
     # The result is capped at 0 (meaning no negative CPL/no "gain" is possible).
@@ -156,49 +260,78 @@ def score_to_cp(score, mate_value=10000):
         # Standard Centipawn score
         return score.cp
 
-def analyze_game(game_pgn, engine):
-    """Processes one game and calculates CPL for every user move, tagging it."""
-    pgn_io = io.StringIO(game_pgn)
-    game = chess.pgn.read_game(pgn_io)
+def analyze_game(game, engine, username):
+    """Processes one parsed game and calculates CPL for every move played by username, tagging it."""
     board = game.board()
     
     analysis_data = {
         'moves_analyzed': 0,
-        'mistakes_by_phase': defaultdict(int), # Stores count of Blunders/Mistakes per phase
-        'phase_cpl_sum': defaultdict(lambda: {'cpl': 0, 'count': 0}),
-        'user_cpl_values': [] # Stores raw CPL for overall ACPL calculation
+        'mistake_counts': np.zeros((len(PHASES), len(_CPL_NAMES)), dtype=np.int64), # Moves per phase and category
+        'phase_cpl': np.zeros(len(PHASES), dtype=np.int64), # CPL sum per phase, indexed like PHASES
+        'phase_cnt': np.zeros(len(PHASES), dtype=np.int64), # Moves per phase, indexed like PHASES
+        'user_cpl_values': np.zeros(0, dtype=np.int32) # Stores raw CPL for overall ACPL calculation
     }
     
+    # The user's color is fixed for the whole game, so work it out once
+    if game.headers["White"] == username:
+        user_color = chess.WHITE
+    elif game.headers["Black"] == username:
+        user_color = chess.BLACK
+    else:
+        return analysis_data # The user didn't play in this game; nothing to analyze
+    
     # ply() gives the half-move number (1. e4 is ply 1, 1...e5 is ply 2)
     move_count = 0 
+    user_cpls = []
+    user_move_nums = []
 
     for move in game.mainline_moves():
         move_count += 1
-        user_turn = (board.turn == chess.WHITE and game.headers["White"] == USERNAME) or \
-                    (board.turn == chess.BLACK and game.headers["Black"] == USERNAME)
 
-        if user_turn:
-            cpl = get_centipawn_loss(engine, board, move)
-            
-            analysis_data['user_cpl_values'].append(cpl)
-            analysis_data['moves_analyzed'] += 1
-            
-            # --- NEW TAGGING LOGIC ---
-            category = get_mistake_category(cpl)
-            phase = get_game_phase(move_count)
-            
-            if category != "Good Move":
-                # Count the total number of mistakes/blunders in this phase
-                analysis_data['mistakes_by_phase'][f"{phase} - {category}"] += 1
+        # Book plies at the very start aren't worth a search (or a place in the stats)
+        if board.turn == user_color and move_count > SKIP_OPENING_PLIES:
+            if board.legal_moves.count() == 1:
+                cpl = 0 # Forced move: there was nothing better to play, so skip the engine
+                board.push(move)
+            else:
+                cpl = analyze_move_inplace(engine, board, move) # Also plays the move
             
-            # Sum CPL for calculating ACPL per phase
-            analysis_data['phase_cpl_sum'][phase]['cpl'] += cpl
-            analysis_data['phase_cpl_sum'][phase]['count'] += 1
-
-        board.push(move)
+            user_cpls.append(cpl)
+            user_move_nums.append(move_count)
+        else:
+            board.push(move)
+    
+    # --- TAGGING: classify and sum every user move in one pass once the engine is done ---
+    cpls = np.asarray(user_cpls, dtype=np.int32)
+    move_nums = np.asarray(user_move_nums, dtype=np.int32)
+    
+    analysis_data['user_cpl_values'] = cpls
+    analysis_data['moves_analyzed'] = int(cpls.size)
+    analysis_data['phase_cpl'], analysis_data['phase_cnt'], analysis_data['mistake_counts'] = _tally(cpls, move_nums)
         
     return analysis_data
 
+# --- PARALLEL ANALYSIS WORKERS ---
+_worker_engine = None # Each worker process owns one Stockfish instance
+
+def init_worker():
+    """Starts the Stockfish engine for this worker process."""
+    global _worker_engine
+    _worker_engine = chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH)
+    # Parallelism comes from running many engines, so keep each one single-threaded
+    # A bigger hash table lets positions seen earlier in the game be reused across searches
+    _worker_engine.configure({"Threads": 1, "Hash": ENGINE_HASH_MB})
+    # Quit the engine when the worker shuts down. python-chess keeps a non-daemon thread
+    # alive until Stockfish exits, and the worker joins that thread before exiting,
+    # so without this the pool (and main) would wait forever.
+    multiprocessing.util.Finalize(None, _worker_engine.quit, exitpriority=10)
+
+def analyze_one(game_pgn, username):
+    """Analyzes a single game for username using this worker's engine."""
+    # Workers get the raw PGN: deep Game trees hit the recursion limit when pickled
+    game = chess.pgn.read_game(io.StringIO(game_pgn))
+    return analyze_game(game, _worker_engine, username)
+
 
 def aggregate_all_games(all_results):
     """Combines stats from multiple games into a single summary dictionary."""
@@ -208,58 +341,89 @@ def aggregate_all_games(all_results):
     final_summary = {
         'total_user_cpl_values': [],
         'total_moves_analyzed': 0,
-        'mistakes_by_phase': defaultdict(int),
-        'phase_cpl_sum': defaultdict(lambda: {'cpl': 0, 'count': 0})
+        'mistake_counts': np.zeros((len(PHASES), len(_CPL_NAMES)), dtype=np.int64),
+        'phase_cpl': np.zeros(len(PHASES), dtype=np.int64),
+        'phase_cnt': np.zeros(len(PHASES), dtype=np.int64)
     }
 
     for data in all_results:
-        # Combine CPL lists for overall ACPL
-        final_summary['total_user_cpl_values'].extend(data['user_cpl_values'])
+        # Collect CPL arrays for overall ACPL
+        final_summary['total_user_cpl_values'].append(data['user_cpl_values'])
         final_summary['total_moves_analyzed'] += data['moves_analyzed']
 
-        # Sum up mistake counts across all games
-        for error_type, count in data['mistakes_by_phase'].items():
-            final_summary['mistakes_by_phase'][error_type] += count
-            
-        # Sum up CPL and count for ACPL per phase
-        for phase, stats in data['phase_cpl_sum'].items():
-            final_summary['phase_cpl_sum'][phase]['cpl'] += stats['cpl']
-            final_summary['phase_cpl_sum'][phase]['count'] += stats['count']
+        # Sum up mistake counts and CPL/move counts per phase across all games
+        final_summary['mistake_counts'] += data['mistake_counts']
+        final_summary['phase_cpl'] += data['phase_cpl']
+        final_summary['phase_cnt'] += data['phase_cnt']
+
+    # Join the per-game arrays once instead of growing a list move by move
+    final_summary['total_user_cpl_values'] = np.concatenate(final_summary['total_user_cpl_values'])
 
     return final_summary
 
 
 
-def save_game_analysis(conn, game_pgn, analysis_data):
-    """Saves a single game's analysis results to the database."""
-    
-    # 1. Parse game header data for required fields (URL, Date)
-    pgn_io = io.StringIO(game_pgn)
-    game = chess.pgn.read_game(pgn_io)
-    
-    # --- START FIX: Use stable SHA-256 hashing for the unique ID ---
-    game_url = game.headers.get("URL") # First, try to get the actual URL
+def _compute_game_id(game_pgn, game_headers_url):
+    """
+    Returns the unique ID used as game_url in the database.
+    The URL header is used when present; otherwise a BLAKE2b hash of the PGN text
+    gives a consistent ID (it only needs to be unique, not cryptographically strong).
+    """
+    if game_headers_url:
+        return game_headers_url
+    pgn_bytes = game_pgn.encode('utf-8')
+    return "BLAKE2_" + hashlib.blake2b(pgn_bytes, digest_size=32).hexdigest()
 
-    if not game_url:
-        # If the URL header is missing, generate a consistent ID from the PGN content
-        pgn_bytes = game_pgn.encode('utf-8')
-        game_hash = hashlib.sha256(pgn_bytes).hexdigest()
-        game_url = "SHA256_" + game_hash
-    # --- END FIX ---
+def build_analysis_row(headers, game_pgn, analysis_data, username, game_url=None):
+    """
+    Builds the analyzed_games row for a single game's analysis results.
+    headers are the game's PGN headers (see chess.pgn.read_headers).
+    Pass game_url if the ID was already computed (e.g. by filter_unanalyzed).
+    """
     
-    game_date = game.headers.get("Date", "1970.01.01")
+    # 1. Use the game's header data for required fields (URL, Date)
+    if game_url is None:
+        game_url = _compute_game_id(game_pgn, headers.get("URL"))
     
-    # 2. Calculate ACPL for each phase from the analysis_data
-    # ... (rest of the helper functions and ACPL calculations are unchanged)
+    game_date = headers.get("Date", "1970.01.01")
+    
+    # 2. Calculate ACPL overall and for each phase from the analysis_data (None if no moves)
+    user_cpl_values = analysis_data['user_cpl_values']
+    overall_acpl = float(user_cpl_values.mean()) if user_cpl_values.size else None
+    opening_acpl, middlegame_acpl, endgame_acpl = (
+        float(cpl / count) if count else None
+        for cpl, count in zip(analysis_data['phase_cpl'], analysis_data['phase_cnt'])
+    )
     
     # 3. Use the JSONB field for the detailed mistake counts
-    mistake_json = json.dumps(dict(analysis_data['mistakes_by_phase']))
+    mistake_json = json.dumps(mistakes_by_phase(analysis_data['mistake_counts']))
+
+    return (
+        game_url, # Now this is a consistent ID!
+        username, # The same username the game was analyzed for
+        game_date,
+        game_pgn,
+        overall_acpl,
+        opening_acpl,
+        middlegame_acpl,
+        endgame_acpl,
+        mistake_json
+    )
+
+def save_analysis_rows(conn, rows):
+    """Saves a batch of rows from build_analysis_row with one statement and one commit."""
+    
+    if not rows:
+        return
+    
+    # A single INSERT can't update the same game twice, so keep the last row per game_url
+    rows = list({row[0]: row for row in rows}.values())
 
     cursor = conn.cursor()
     
     insert_query = """
     INSERT INTO analyzed_games (game_url, username, date, pgn, overall_acpl, opening_acpl, middlegame_acpl, endgame_acpl, mistake_breakdown)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    VALUES %s
     ON CONFLICT (game_url) DO UPDATE SET
         overall_acpl = EXCLUDED.overall_acpl,
         opening_acpl = EXCLUDED.opening_acpl,
@@ -269,20 +433,10 @@ def save_game_analysis(conn, game_pgn, analysis_data):
     """
     
     try:
-        cursor.execute(insert_query, (
-            game_url, # Now this is a consistent ID!
-            USERNAME, # Using the global username from config
-            game_date,
-            game_pgn,
-            overall_acpl,
-            opening_acpl,
-            middlegame_acpl,
-            endgame_acpl,
-            mistake_json
-        ))
+        execute_values(cursor, insert_query, rows, page_size=100)
         conn.commit()
     except Exception as e:
-        print(f"Error inserting game {game_url}: {e}")
+        print(f"Error inserting {len(rows)} game(s): {e}")
         conn.rollback()
     finally:
         cursor.close()
@@ -296,12 +450,12 @@ def generate_report(aggregated_data):
 
     user_cpl_values = aggregated_data['total_user_cpl_values']
     
-    if not user_cpl_values:
+    if user_cpl_values.size == 0:
         print("No moves were analyzed for the user across all games.")
         return
 
     # 1. Overall Summary
-    avg_cpl = sum(user_cpl_values) / len(user_cpl_values)
+    avg_cpl = user_cpl_values.mean()
     print("\n\n--- ♟️ COACHING REPORT (10 Games) ---")
     print(f"Overall Accuracy Score (ACPL): **{avg_cpl:.2f} cp** (This places you in the Beginner range >100 cp)")
     
@@ -312,12 +466,13 @@ def generate_report(aggregated_data):
     highest_cpl_phase = None
     max_acpl = -1
     
-    phase_stats = aggregated_data['phase_cpl_sum']
+    phase_cpl = aggregated_data['phase_cpl']
+    phase_cnt = aggregated_data['phase_cnt']
     
-    for phase, stats in phase_stats.items():
-        if stats['count'] > 0:
-            phase_acpl = stats['cpl'] / stats['count']
-            print(f"- {phase} ACPL: {phase_acpl:.2f} cp ({stats['count']} moves)")
+    for i, phase in enumerate(PHASES):
+        if phase_cnt[i] > 0:
+            phase_acpl = phase_cpl[i] / phase_cnt[i]
+            print(f"- {phase} ACPL: {phase_acpl:.2f} cp ({phase_cnt[i]} moves)")
             
             if phase_acpl > max_acpl:
                 max_acpl = phase_acpl
@@ -331,7 +486,7 @@ def generate_report(aggregated_data):
     total_mistakes = 0
     
     # Find the most common specific mistake type
-    mistake_counts = aggregated_data['mistakes_by_phase']
+    mistake_counts = mistakes_by_phase(aggregated_data['mistake_counts'])
     
     if mistake_counts:
         most_common_error = max(mistake_counts.items(), key=lambda item: item[1], default=("None", 0))
@@ -344,49 +499,40 @@ def generate_report(aggregated_data):
                 print(f"- {error}: {count} times")
             print(f"\n**Total Blunders/Mistakes/Inaccuracies:** {total_mistakes}")
 
-def is_game_analyzed(conn, game_pgn):
-    """Checks the database to see if a game (by URL) has already been analyzed."""
-    
-    # Extract the unique URL from the PGN header
-    pgn_io = io.StringIO(game_pgn)
-    game = chess.pgn.read_game(pgn_io)
-
-    # --- SIMPLIFIED AND ENFORCED CONSISTENT ID GENERATION ---
-    # NEW CODE (Guarantees consistency)
-    game_url = game.headers.get("URL")
-    
-    if not game_url:
-        # If the URL header is missing (as is common with Chess.com API PGNs)
-        # Use SHA-256 hash of the PGN text to create a unique, consistent ID
-        pgn_bytes = game_pgn.encode('utf-8')
-        game_hash = hashlib.sha256(pgn_bytes).hexdigest()
-        game_url = "SHA256_" + game_hash
-    # --- END CONSISTENT ID GENERATION ---
+def filter_unanalyzed(conn, headed_games):
+    """
+    Takes (headers, pgn) pairs and returns (headers, pgn, game_url) for the games not yet
+    in the database, using a single query.
+    The IDs are returned so callers don't have to hash each PGN again when saving.
+    """
     
-    cursor = conn.cursor()
-    # ... (rest of function remains the same)
+    # One pass to build the consistent IDs
+    candidates = [
+        (headers, game_pgn, _compute_game_id(game_pgn, headers.get("URL")))
+        for headers, game_pgn in headed_games
+    ]
     
     cursor = conn.cursor()
     
-    # Use SELECT EXISTS for the fastest possible check (returns True/False)
-    query = sql.SQL("SELECT EXISTS(SELECT 1 FROM analyzed_games WHERE game_url = %s);")
+    # ANY(%s) lets us check every candidate in one round-trip
+    query = sql.SQL("SELECT game_url FROM analyzed_games WHERE game_url = ANY(%s);")
     
     try:
-        cursor.execute(query, (game_url,))
-        # fetchone()[0] gets the boolean result of the EXISTS query
-        already_analyzed = cursor.fetchone()[0] 
-        return already_analyzed
+        cursor.execute(query, ([game_url for _, _, game_url in candidates],))
+        analyzed_urls = {row[0] for row in cursor.fetchall()}
     except Exception as e:
-        # If the table doesn't exist or there's an error, assume it's not analyzed
+        # If the table doesn't exist or there's an error, assume nothing is analyzed
         print(f"Database check error: {e}. Assuming unanalyzed.")
-        return False
+        conn.rollback()
+        analyzed_urls = set()
     finally:
         cursor.close()
+    
+    return [candidate for candidate in candidates if candidate[2] not in analyzed_urls]
 
 def main():
     # --- MAIN EXECUTION (Updated for DB Skip Logic) ---
     conn = None  # Initialize outside try
-    engine = None  # Initialize outside try
 
     try:
         # 1. Database Connection
@@ -395,44 +541,70 @@ def main():
             print("Fatal: Could not connect to database. Aborting analysis.")
             return
 
-        # 2. Stockfish Engine Initialization
-        print(f"Initializing Stockfish at depth {ANALYSIS_DEPTH}...")
-        engine = chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH)
-
-        # 3. Data Fetching
-        print(f"Fetching last {NUM_GAMES} games for {USERNAME} from Chess.com...")
-        games_pgn_list = fetch_chessdotcom_games(USERNAME, NUM_GAMES)
-        
-        if not games_pgn_list:
-            print("Could not fetch any games from Chess.com. Aborting analysis.")
-            return
-
-        # 4. Filter Games: Implement DB Skip Logic
-        games_to_analyze = []
-        print("Checking database for analyzed games...", end="", flush=True)
-        
-        for game_pgn in games_pgn_list:
-            if conn and is_game_analyzed(conn, game_pgn):
-                print(".", end="", flush=True) # Print a dot for each skipped game
-            else:
-                games_to_analyze.append(game_pgn)
-
-        print(f"\nFound {len(games_to_analyze)} new game(s) needing analysis.")
+        # 2. Data Fetching
+        # Games are downloaded on a background thread and handed over through a queue,
+        # so analysis of the first games starts while later archives are still downloading.
+        # Read the configured username once; fetching, analysis and saving all use this value
+        username = USERNAME
+        print(f"Fetching last {NUM_GAMES} games for {username} from Chess.com...")
+        pgn_queue = queue.Queue()
+        producer = threading.Thread(target=_produce_games, args=(pgn_queue, username, NUM_GAMES), daemon=True)
+        producer.start()
         
-        # 5. Analysis and Saving Loop
+        # Games are independent, so each worker analyzes whole games with its own
+        # Stockfish engine. DB writes stay in this process.
+        # Workers are spawned rather than forked, since the fetch thread is already running.
         all_cpl_results = []
+        pending_rows = []
+        num_workers = min(NUM_WORKERS, NUM_GAMES)
+        print(f"Initializing {num_workers} Stockfish worker(s) with {ANALYSIS_NODES:,} nodes per search...")
         
-        for i, game_pgn in enumerate(games_to_analyze):
-            print(f"Analyzing new game {i+1}/{len(games_to_analyze)}...")
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        ) as executor:
             
-            # ANALYSIS
-            result = analyze_game(game_pgn, engine)
-            all_cpl_results.append(result)
+            # 3. Filter Games: Implement DB Skip Logic, one query per batch of arrived games
+            print("Checking database for analyzed games...")
+            games_fetched = 0
+            games_to_analyze = []
             
-            # DATABASE SAVE
-            save_game_analysis(conn, game_pgn, result)
-
-        # 6. Final Report Generation
+            for pgn_batch in _drain_batches(pgn_queue):
+                games_fetched += len(pgn_batch)
+                # Only the headers are needed here (URL for the DB check, Date for the save);
+                # the full parse of the moves happens once, in the worker
+                headed_games = [(chess.pgn.read_headers(io.StringIO(game_pgn)), game_pgn) for game_pgn in pgn_batch]
+                headed_games = [(headers, game_pgn) for headers, game_pgn in headed_games if headers is not None]
+                
+                for headers, game_pgn, game_url in filter_unanalyzed(conn, headed_games):
+                    future = executor.submit(analyze_one, game_pgn, username)
+                    games_to_analyze.append((headers, game_pgn, game_url, future))
+            
+            if not games_fetched:
+                print("Could not fetch any games from Chess.com. Aborting analysis.")
+                return
+            
+            skipped = games_fetched - len(games_to_analyze)
+            print(f"Skipped {skipped} already analyzed game(s). Found {len(games_to_analyze)} new game(s) needing analysis.")
+            
+            # 4. Analysis and Saving Loop: results are collected in fetch order
+            try:
+                for i, (headers, game_pgn, game_url, future) in enumerate(games_to_analyze):
+                    result = future.result()
+                    print(f"Analyzed new game {i+1}/{len(games_to_analyze)}.")
+                    all_cpl_results.append(result)
+                    
+                    # DATABASE SAVE (batched: one INSERT and one commit per SAVE_BATCH_SIZE games)
+                    pending_rows.append(build_analysis_row(headers, game_pgn, result, username, game_url=game_url))
+                    if len(pending_rows) >= SAVE_BATCH_SIZE:
+                        save_analysis_rows(conn, pending_rows)
+                        pending_rows = []
+            finally:
+                # Save whatever was analyzed, even if a later game failed
+                save_analysis_rows(conn, pending_rows)
+
+        # 5. Final Report Generation
         # Aggregate ALL fetched games (analyzed and skipped) for a comprehensive report.
         # Note: If no new games were analyzed, we still aggregate the old ones from the DB 
         # for reporting, but for simplicity here, we only use the newly analyzed results.
@@ -448,12 +620,7 @@ def main():
         print(f"\nAN ERROR OCCURRED: {e}")
 
     finally:
-        # close engine and DB connection if they were opened
-        if engine is not None:
-            try:
-                engine.quit()
-            except Exception:
-                pass
+        # close DB connection if it was opened (worker engines shut down with the pool)
         if conn is not None:
             try:
                 conn.close()
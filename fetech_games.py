@@ -4,53 +4,98 @@ import chess.pgn
 import chess.engine
 import io
 import requests
-# --- ADD THIS IMPORT at the top of your script ---
-from collections import defaultdict
+import os
+import numpy as np
+try:
+    from numba import njit
+except ImportError: # Numba is optional; without it _tally just runs as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
 
 # --- CONFIGURATION (unchanged from last step) ---
 USERNAME = 'kirat0070' 
 NUM_GAMES = 10
 STOCKFISH_PATH = '/usr/games/stockfish' 
-ANALYSIS_DEPTH = 18 
+ANALYSIS_NODES = 1_000_000 # Search budget per position; a fixed node count keeps time per move predictable
+MULTIPV = 2 # Lines per search; the user's move is usually one of them
+SKIP_OPENING_PLIES = 4 # Opening plies (both sides) left out of the analysis
+ENGINE_THREADS = max(1, (os.cpu_count() or 2) // 2)
+ENGINE_HASH_MB = 512 # Transposition table size
 # ---------------------
 
-def get_mistake_category(cpl):
-    """Categorizes the CPL into human-readable terms."""
-    if cpl > 300:
-        return "Blunder"
-    elif cpl > 100:
-        return "Mistake"
-    elif cpl > 50:
-        return "Inaccuracy"
-    else:
-        return "Good Move"
-
-def get_game_phase(move_num):
-    """Determines the phase of the game based on the move number."""
-    if move_num <= 10:
-        return "Opening"
-    elif move_num <= 30:
-        return "Middlegame"
-    else:
-        return "Endgame"
+# Bucket edges: values up to and including each threshold fall in that bucket.
+_CPL_THRESHOLDS = (50, 100, 300)
+_CPL_NAMES = ("Good Move", "Inaccuracy", "Mistake", "Blunder") # Mistake categories by CPL bucket
+_PHASE_CUTOFFS = (10, 30) # Move numbers that end the Opening and the Middlegame
+PHASES = ("Opening", "Middlegame", "Endgame")
+
+@njit(cache=True)
+def _tally(cpls, move_nums):
+    """
+    Classifies and sums every user move of a game in one compiled loop.
+    Returns (phase_cpl[3], phase_cnt[3], mistake_counts[3, 4]), indexed like PHASES x _CPL_NAMES.
+    """
+    phase_cpl = np.zeros(3, dtype=np.int64)
+    phase_cnt = np.zeros(3, dtype=np.int64)
+    mistake_counts = np.zeros((3, 4), dtype=np.int64)
+    
+    for i in range(cpls.shape[0]):
+        cpl = cpls[i]
+        move_num = move_nums[i]
+        phase = 0 if move_num <= _PHASE_CUTOFFS[0] else (1 if move_num <= _PHASE_CUTOFFS[1] else 2)
+        # Each threshold the CPL is above moves it up one category
+        category = 0
+        for threshold in _CPL_THRESHOLDS:
+            category += cpl > threshold
+        
+        phase_cpl[phase] += cpl
+        phase_cnt[phase] += 1
+        mistake_counts[phase, category] += 1
+    
+    return phase_cpl, phase_cnt, mistake_counts
+
+def mistakes_by_phase(mistake_counts):
+    """Turns a phase x category count matrix into {"Phase - Category": count}, leaving out good moves."""
+    return {
+        f"{PHASES[phase]} - {_CPL_NAMES[category]}": int(mistake_counts[phase, category])
+        for phase in range(len(PHASES))
+        for category in range(1, len(_CPL_NAMES))
+        if mistake_counts[phase, category]
+    }
     
-# --- (Keep get_centipawn_loss function here - It is unchanged) ---
-def get_centipawn_loss(engine, board, move):
+# Built once and shared by every search. Only request the info fields we read,
+# so python-chess skips parsing the rest of each UCI info line.
+_LIMIT = chess.engine.Limit(nodes=ANALYSIS_NODES)
+_INFO = chess.engine.INFO_SCORE
+_INFO_MULTIPV = chess.engine.INFO_SCORE | chess.engine.INFO_PV # PV is needed to match the user's move
+
+def evaluate_position(engine, board):
+    """Returns the engine's evaluation of the board in centipawns, relative to the side to move."""
+    info = engine.analyse(board, _LIMIT, info=_INFO)
+    return score_to_cp(info['score'].relative, mate_value=10000)
+
+def analyze_move_inplace(engine, board, move):
     """
     Calculates the CPL for a given move using the best practice of
     comparing the value of the engine's best move to the actual move.
+    The move is played on the board (and left there), so the caller must not push it again.
     """
     
-    # 1. Evaluate the position *before* the move to find the BEST possible score
-    # We use a deeper search here to ensure we find the true best move evaluation
-    info_best = engine.analyse(board, chess.engine.Limit(depth=18)) # Use your set ANALYSIS_DEPTH
-    score_best = score_to_cp(info_best['score'].relative, mate_value=10000)
+    # 1. One MultiPV search of the position *before* the move gives the BEST
+    # score and, usually, the score of the user's move from the same tree.
+    info_list = engine.analyse(board, _LIMIT, multipv=MULTIPV, info=_INFO_MULTIPV)
+    score_best = score_to_cp(info_list[0]['score'].relative, mate_value=10000)
     
-    # 2. Evaluate the position *after* the user's actual move
-    board.push(move)
-    info_actual = engine.analyse(board, chess.engine.Limit(depth=18))
-    score_actual = score_to_cp(info_actual['score'].relative, mate_value=10000)
-    board.pop()
+    for info in info_list:
+        if info.get('pv') and info['pv'][0] == move:
+            score_actual = score_to_cp(info['score'].relative, mate_value=10000)
+            board.push(move)
+            break
+    else:
+        # 2. The user's move isn't among the top lines: evaluate the position
+        # *after* it. That score is relative to the opponent, so negate it.
+        board.push(move)
+        score_actual = -evaluate_position(engine, board)
     
     # CPL is the difference between the best possible evaluation and the evaluation after the move.
     # The result is capped at 0 (meaning no negative CPL/no "gain" is possible).
@@ -76,51 +121,57 @@ def score_to_cp(score, mate_value=10000):
         # Standard Centipawn score
         return score.cp
 
-def analyze_game(game_pgn, engine):
-    """Processes one game and calculates CPL for every user move, tagging it."""
-    pgn_io = io.StringIO(game_pgn)
-    game = chess.pgn.read_game(pgn_io)
+def analyze_game(game, engine, username):
+    """Processes one parsed game and calculates CPL for every move played by username, tagging it."""
     board = game.board()
     
     analysis_data = {
         'moves_analyzed': 0,
-        'mistakes_by_phase': defaultdict(int), # Stores count of Blunders/Mistakes per phase
-        'phase_cpl_sum': defaultdict(lambda: {'cpl': 0, 'count': 0}),
-        'user_cpl_values': [] # Stores raw CPL for overall ACPL calculation
+        'mistake_counts': np.zeros((len(PHASES), len(_CPL_NAMES)), dtype=np.int64), # Moves per phase and category
+        'phase_cpl': np.zeros(len(PHASES), dtype=np.int64), # CPL sum per phase, indexed like PHASES
+        'phase_cnt': np.zeros(len(PHASES), dtype=np.int64), # Moves per phase, indexed like PHASES
+        'user_cpl_values': np.zeros(0, dtype=np.int32) # Stores raw CPL for overall ACPL calculation
     }
     
+    # The user's color is fixed for the whole game, so work it out once
+    if game.headers["White"] == username:
+        user_color = chess.WHITE
+    elif game.headers["Black"] == username:
+        user_color = chess.BLACK
+    else:
+        return analysis_data # The user didn't play in this game; nothing to analyze
+    
     # ply() gives the half-move number (1. e4 is ply 1, 1...e5 is ply 2)
     move_count = 0 
+    user_cpls = []
+    user_move_nums = []
 
     for move in game.mainline_moves():
         move_count += 1
-        user_turn = (board.turn == chess.WHITE and game.headers["White"] == USERNAME) or \
-                    (board.turn == chess.BLACK and game.headers["Black"] == USERNAME)
 
-        if user_turn:
-            cpl = get_centipawn_loss(engine, board, move)
-            
-            analysis_data['user_cpl_values'].append(cpl)
-            analysis_data['moves_analyzed'] += 1
+        # Book plies at the very start aren't worth a search (or a place in the stats)
+        if board.turn == user_color and move_count > SKIP_OPENING_PLIES:
+            if board.legal_moves.count() == 1:
+                cpl = 0 # Forced move: there was nothing better to play, so skip the engine
+                board.push(move)
+            else:
+                cpl = analyze_move_inplace(engine, board, move) # Also plays the move
             
-            # --- NEW TAGGING LOGIC ---
-            category = get_mistake_category(cpl)
-            phase = get_game_phase(move_count)
-            
-            if category != "Good Move":
-                # Count the total number of mistakes/blunders in this phase
-                analysis_data['mistakes_by_phase'][f"{phase} - {category}"] += 1
-            
-            # Sum CPL for calculating ACPL per phase
-            analysis_data['phase_cpl_sum'][phase]['cpl'] += cpl
-            analysis_data['phase_cpl_sum'][phase]['count'] += 1
-
-        board.push(move)
+            user_cpls.append(cpl)
+            user_move_nums.append(move_count)
+        else:
+            board.push(move)
+    
+    # --- TAGGING: classify and sum every user move in one pass once the engine is done ---
+    cpls = np.asarray(user_cpls, dtype=np.int32)
+    move_nums = np.asarray(user_move_nums, dtype=np.int32)
+    
+    analysis_data['user_cpl_values'] = cpls
+    analysis_data['moves_analyzed'] = int(cpls.size)
+    analysis_data['phase_cpl'], analysis_data['phase_cnt'], analysis_data['mistake_counts'] = _tally(cpls, move_nums)
         
     return analysis_data
 
-from collections import defaultdict
-
 def aggregate_all_games(all_results):
     """Combines stats from multiple games into a single summary dictionary."""
     if not all_results:
@@ -129,23 +180,23 @@ def aggregate_all_games(all_results):
     final_summary = {
         'total_user_cpl_values': [],
         'total_moves_analyzed': 0,
-        'mistakes_by_phase': defaultdict(int),
-        'phase_cpl_sum': defaultdict(lambda: {'cpl': 0, 'count': 0})
+        'mistake_counts': np.zeros((len(PHASES), len(_CPL_NAMES)), dtype=np.int64),
+        'phase_cpl': np.zeros(len(PHASES), dtype=np.int64),
+        'phase_cnt': np.zeros(len(PHASES), dtype=np.int64)
     }
 
     for data in all_results:
-        # Combine CPL lists for overall ACPL
-        final_summary['total_user_cpl_values'].extend(data['user_cpl_values'])
+        # Collect CPL arrays for overall ACPL
+        final_summary['total_user_cpl_values'].append(data['user_cpl_values'])
         final_summary['total_moves_analyzed'] += data['moves_analyzed']
 
-        # Sum up mistake counts across all games
-        for error_type, count in data['mistakes_by_phase'].items():
-            final_summary['mistakes_by_phase'][error_type] += count
-            
-        # Sum up CPL and count for ACPL per phase
-        for phase, stats in data['phase_cpl_sum'].items():
-            final_summary['phase_cpl_sum'][phase]['cpl'] += stats['cpl']
-            final_summary['phase_cpl_sum'][phase]['count'] += stats['count']
+        # Sum up mistake counts and CPL/move counts per phase across all games
+        final_summary['mistake_counts'] += data['mistake_counts']
+        final_summary['phase_cpl'] += data['phase_cpl']
+        final_summary['phase_cnt'] += data['phase_cnt']
+
+    # Join the per-game arrays once instead of growing a list move by move
+    final_summary['total_user_cpl_values'] = np.concatenate(final_summary['total_user_cpl_values'])
 
     return final_summary
 
@@ -159,12 +210,12 @@ def generate_report(aggregated_data):
 
     user_cpl_values = aggregated_data['total_user_cpl_values']
     
-    if not user_cpl_values:
+    if user_cpl_values.size == 0:
         print("No moves were analyzed for the user across all games.")
         return
 
     # 1. Overall Summary
-    avg_cpl = sum(user_cpl_values) / len(user_cpl_values)
+    avg_cpl = user_cpl_values.mean()
     print("\n\n--- ♟️ COACHING REPORT (10 Games) ---")
     print(f"Overall Accuracy Score (ACPL): **{avg_cpl:.2f} cp** (This places you in the Beginner range >100 cp)")
     
@@ -175,12 +226,13 @@ def generate_report(aggregated_data):
     highest_cpl_phase = None
     max_acpl = -1
     
-    phase_stats = aggregated_data['phase_cpl_sum']
+    phase_cpl = aggregated_data['phase_cpl']
+    phase_cnt = aggregated_data['phase_cnt']
     
-    for phase, stats in phase_stats.items():
-        if stats['count'] > 0:
-            phase_acpl = stats['cpl'] / stats['count']
-            print(f"- {phase} ACPL: {phase_acpl:.2f} cp ({stats['count']} moves)")
+    for i, phase in enumerate(PHASES):
+        if phase_cnt[i] > 0:
+            phase_acpl = phase_cpl[i] / phase_cnt[i]
+            print(f"- {phase} ACPL: {phase_acpl:.2f} cp ({phase_cnt[i]} moves)")
             
             if phase_acpl > max_acpl:
                 max_acpl = phase_acpl
@@ -194,7 +246,7 @@ def generate_report(aggregated_data):
     total_mistakes = 0
     
     # Find the most common specific mistake type
-    mistake_counts = aggregated_data['mistakes_by_phase']
+    mistake_counts = mistakes_by_phase(aggregated_data['mistake_counts'])
     
     if mistake_counts:
         most_common_error = max(mistake_counts.items(), key=lambda item: item[1], default=("None", 0))
@@ -211,9 +263,11 @@ def generate_report(aggregated_data):
 
 try:
     # Initialize the Stockfish Engine
-    print(f"Initializing Stockfish at depth {ANALYSIS_DEPTH}...")
+    print(f"Initializing Stockfish with {ANALYSIS_NODES:,} nodes per search...")
     # FIX APPLIED HERE: Ensure you have made this change!
     engine = chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH) 
+    # Stockfish defaults to 1 thread and a 16 MB hash; use more of the machine
+    engine.configure({"Threads": ENGINE_THREADS, "Hash": ENGINE_HASH_MB})
 
     # Lichess Data Fetcher Setup
     session = requests.Session() 
@@ -229,7 +283,8 @@ try:
     all_cpl_results = []
     
     for game_pgn in games:
-        result = analyze_game(game_pgn, engine)
+        game = chess.pgn.read_game(io.StringIO(game_pgn))
+        result = analyze_game(game, engine, USERNAME)
         all_cpl_results.append(result)
 
     # 1. Aggregate the 10 games into one summary report